@@ -4,28 +4,92 @@ warnings.filterwarnings("ignore", category=ResourceWarning)
 warnings.filterwarnings("ignore", category=UserWarning, module="pydantic")
 
 import gradio as gr
-import atexit
-from typing import List
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextlib import ExitStack
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 from pathlib import Path
 
 from tech_europe_hackathon.agents import TextPreparationAgent, TextModificationAgent
-from tech_europe_hackathon.utils import TextDocument, StorageManager, AudioProcessor, get_supported_formats
+from tech_europe_hackathon.utils import CONFIG, TextDocument, StorageManager, AudioProcessor, SemanticCache, get_supported_formats, close_llm_clients
+
+# Supported audio extensions, resolved once for O(1) membership checks
+_SUPPORTED_FORMATS: frozenset = frozenset(get_supported_formats())
+
+# Footnotes table column headers
+_FOOTNOTE_SAVE_COL = "Save"
+_FOOTNOTE_REF_COL = "References (Only modify this)"
+
+# Shared sentinel payloads for no-op/reset responses (never mutated)
+_EMPTY_MULTIMODAL = {"text": "", "files": []}
+_EMPTY_FOOTNOTE_ROWS = [[False, 0, "No footnotes available"]]
+
+# Speculative URL scraping
+_URL_RE = re.compile(r"https?://\S+\.\S+")
+_URL_PREFETCH_TTL = 300  # seconds
+
+# Most recent modification results kept in memory
+_MOD_CACHE_SIZE = 128
+
+# Stats updates wait this long after the last keystroke
+_STATS_DEBOUNCE_MS = 300
+
+
+def _debounce_js(key: str, delay_ms: int = _STATS_DEBOUNCE_MS) -> str:
+    """
+    Client-side debounce for a single-input event: every call restarts the timer and only
+    the last call in the window resolves. Gradio only sends the event to the server once
+    the js promise resolves, so superseded keystrokes never make a request.
+    """
+    return f"""
+    (value) => new Promise((resolve) => {{
+        const timers = window.__techeuDebounce = window.__techeuDebounce || {{}};
+        clearTimeout(timers["{key}"]);
+        timers["{key}"] = setTimeout(() => resolve(value), {delay_ms});
+    }})
+    """
 
 class TextEditor:
     def __init__(self):
-        self.storage_manager = StorageManager()
         self.document = TextDocument()
-        self.audio_processor = AudioProcessor()
         self.prep_agent = None
         self.mod_agent = None
-        self.setup_agents()
+        # Open resources atomically: if a later one fails, those already opened are closed
+        # (once construction succeeds, cleanup() takes over)
+        with ExitStack() as stack:
+            stack.callback(close_llm_clients)
+            self.storage_manager = StorageManager()
+            stack.callback(self.storage_manager.close)
+            self.audio_processor = AudioProcessor()
+            stack.callback(self.audio_processor.close)
+            self.setup_agents()
+            stack.pop_all()
         # Track selection indices for precise text replacement
         self.selection_start = 0
         self.selection_end = 0
+        # Bounded LRU of modification results so repeated prompts skip the LLM round trip
+        # (preparation results are cached, with a TTL, by the agent's SemanticCache)
+        self._mod_cache: "OrderedDict[str, str]" = OrderedDict()
+        # Transcriptions keyed by audio content hash, persisted across sessions
+        self._audio_cache_path = Path.home() / ".techeu" / "audio_cache.json"
+        self._audio_cache = self._load_audio_cache()
+        self._audio_cache_lock = threading.Lock()
+        # Shared worker pool for concurrent I/O-bound work (audio transcription, URL prefetch)
+        self._pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="techeu")
+        # In-flight URL scrapes started while the user is still typing: url -> (started_at, future)
+        self._url_prefetch: Dict[str, Tuple[float, Future]] = {}
+        self._url_prefetch_lock = threading.Lock()
 
     def setup_agents(self):
-        self.prep_agent = TextPreparationAgent()
+        # Agent results are cached in the same Weaviate cluster as the documents
+        self.prep_agent = TextPreparationAgent(cache=SemanticCache(self.storage_manager.client))
         self.mod_agent = TextModificationAgent()
 
     def new_document(self):
@@ -36,7 +100,7 @@ class TextEditor:
         gr.Info("New document created")
         # Return empty text areas, footnotes, and initial stats data
         initial_context_data = [[0, 0, "0:0"]]
-        return "", "", "", self._format_footnotes(), initial_context_data
+        return "", "", "", _EMPTY_FOOTNOTE_ROWS, initial_context_data
 
     def clear_document(self):
         # Reset document and selection indices
@@ -48,40 +112,39 @@ class TextEditor:
         initial_context_data = [[0, 0, "0:0"]]
         return "", "", "", initial_context_data
 
-    def copy_to_context(self, source_text: str, selected_text: str):
+    def copy_to_context(self, source_text: str, selection):
         """Copy selected text from preparation to context area and track indices."""
-        # Determine what text to copy
-        text_to_copy = selected_text if selected_text.strip() else source_text
-        
-        if not text_to_copy.strip():
-            gr.Warning("No text to copy.")
-            return "", ""
-        
-        # Find the selected text in source and calculate indices
-        if text_to_copy != source_text and text_to_copy.strip():
-            start_idx = source_text.find(text_to_copy)
-            if start_idx != -1:
-                end_idx = start_idx + len(text_to_copy)
-                self.selection_start = start_idx
-                self.selection_end = end_idx
-                index_info = f"Selection: {start_idx}:{end_idx}"
-            else:
-                # Selected text not found, use full text
-                self.selection_start = 0
-                self.selection_end = len(source_text)
-                text_to_copy = source_text
-                index_info = f"Selection: 0:{len(source_text)} (full text)"
+        # Selection state holds the selected text plus the offsets reported by Gradio
+        if isinstance(selection, dict):
+            selected_text = selection.get("text", "")
+            sel_start, sel_end = selection.get("start"), selection.get("end")
         else:
-            # Full text selected
-            self.selection_start = 0
-            self.selection_end = len(source_text)
-            text_to_copy = source_text
-            index_info = f"Selection: 0:{len(source_text)} (full text)"
+            selected_text = selection or ""
+            sel_start = sel_end = None
+        
+        if not selected_text.strip():
+            # Nothing selected: copy the full text
+            if not source_text.strip():
+                gr.Warning("No text to copy.")
+                return "", ""
+            start_idx, end_idx = 0, len(source_text)
+        elif (sel_start is not None and sel_end is not None and sel_end - sel_start == len(selected_text)
+                and source_text.startswith(selected_text, sel_start)):
+            # Offsets from the select event still match the source text
+            start_idx, end_idx = sel_start, sel_end
+        else:
+            # Offsets missing or stale: locate the selection, or fall back to the full text
+            start_idx = source_text.find(selected_text)
+            end_idx = start_idx + len(selected_text) if start_idx != -1 else len(source_text)
+            start_idx = max(start_idx, 0)
+        
+        self.selection_start = start_idx
+        self.selection_end = end_idx
+        text_to_copy = source_text if (start_idx, end_idx) == (0, len(source_text)) else selected_text
         
         gr.Info(f"Text copied to context area (indices: {self.selection_start}:{self.selection_end})")
         # Return text and DataFrame data for context stats
-        words = len(text_to_copy.split()) if text_to_copy else 0
-        chars = len(text_to_copy)
+        words, chars, _ = self.get_text_stats(text_to_copy)
         selection_range = f"{self.selection_start}:{self.selection_end}"
         context_data = [[words, chars, selection_range]]
         return text_to_copy, context_data
@@ -105,14 +168,13 @@ class TextEditor:
         start_idx = max(0, self.selection_start)
         end_idx = min(len(source_text), self.selection_end)
         
-        # Verify that the context text matches the selected region
-        selected_region = source_text[start_idx:end_idx]
-        if selected_region != context_text:
+        # Verify that the context text matches the selected region (compared in place, no slice copy)
+        if end_idx - start_idx != len(context_text) or not source_text.startswith(context_text, start_idx):
             gr.Warning("Context text doesn't match selected region. Source text may have changed.")
             return source_text
         
-        # Replace the selected region with modified text
-        new_source = source_text[:start_idx] + modification_text + source_text[end_idx:]
+        # Replace the selected region with modified text in a single allocation
+        new_source = "".join((source_text[:start_idx], modification_text, source_text[end_idx:]))
         self.document.update_text(new_source)
         
         # Reset selection indices after applying
@@ -122,46 +184,60 @@ class TextEditor:
         gr.Info(f"Modified text applied successfully at indices {start_idx}:{end_idx}")
         return new_source
 
-    def get_word_count(self, text: str):
-        return len(text.split()) if text else 0
+    def get_text_stats(self, text: str) -> Tuple[int, int, int]:
+        """Return (words, characters, lines) for a textbox, skipping all scans for empty text"""
+        if not text:
+            return 0, 0, 0
+        return len(text.split()), len(text), text.count('\n') + 1
+
+    def _cache_key(self, *parts: str) -> str:
+        """Build a cache key from whitespace/case-normalized parts"""
+        normalized = "|".join(" ".join(part.lower().split()) for part in parts)
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
 
     def _format_footnotes(self):
-        if self.document.footnotes and len(self.document.footnotes) > 0:
-            # Return DataFrame data with checkbox, index, and footnote columns
-            return [[True, i, footnote] for i, footnote in enumerate(self.document.footnotes, 1)]
-        return [[False, 0, "No footnotes available"]]
+        # Rows are cached on the document until its footnotes change
+        if self.document._footnote_rows is None:
+            if self.document.footnotes and len(self.document.footnotes) > 0:
+                # Return DataFrame data with checkbox, index, and footnote columns
+                self.document._footnote_rows = [[True, i, footnote] for i, footnote in enumerate(self.document.footnotes, 1)]
+            else:
+                self.document._footnote_rows = _EMPTY_FOOTNOTE_ROWS
+        return self.document._footnote_rows
 
-    def execute_action(self, multimodal_input, source_text: str, context_text: str, modification_text: str, selected_panel: str, url_input: str = ""):
-        """Execute AI action based on multimodal input and selected panel."""
+    def execute_action(self, multimodal_input, source_text: str, context_text: str, modification_text: str, selected_panel: str):
+        """Handle submissions that need no agent call, leaving all panels unchanged."""
         if not multimodal_input:
             gr.Warning("Please provide input")
             return source_text, context_text, modification_text, self._format_footnotes(), multimodal_input
         
-        # Extract and process input (audio + text)
+        if selected_panel == "modification":
+            gr.Warning("No text available to modify in modification mode.")
+        return source_text, context_text, modification_text, self._format_footnotes(), _EMPTY_MULTIMODAL
+
+    def execute_action_stream(self, multimodal_input, source_text: str, context_text: str, modification_text: str, selected_panel: str, url_input: str = ""):
+        """Execute AI action based on multimodal input and selected panel, yielding generated/modified text as it arrives."""
+        text_to_modify = context_text or modification_text
+        streamable = selected_panel == "preparation" or (selected_panel == "modification" and text_to_modify.strip())
+        if not multimodal_input or not streamable:
+            yield self.execute_action(multimodal_input, source_text, context_text, modification_text, selected_panel)
+            return
+        
         final_prompt = self._extract_prompt_from_multimodal(multimodal_input)
         
         if not final_prompt:
             gr.Warning("Please provide a text prompt or upload an audio file")
-            return source_text, context_text, modification_text, self._format_footnotes(), {"text": "", "files": []}
-
+            yield source_text, context_text, modification_text, self._format_footnotes(), _EMPTY_MULTIMODAL
+            return
+        
         gr.Info(f"Processing: {final_prompt[:80]}...")
         
         if selected_panel == "preparation":
-            gen_text, _, fnotes = self._generate_text(final_prompt, url_input.strip())
-            return gen_text, context_text, modification_text, fnotes, {"text": "", "files": []}
-        elif selected_panel == "modification":
-            # In modification mode
-            if context_text.strip() or modification_text.strip():
-                # Modify existing text
-                text_to_modify = context_text or modification_text
-                if text_to_modify.strip():
-                    mod_text, fnotes = self._modify_text(text_to_modify, final_prompt, source_text)
-                    return source_text, context_text, mod_text, fnotes, {"text": "", "files": []}
-                else:
-                    gr.Warning("No text available to modify in modification mode.")
-                    return source_text, context_text, modification_text, self._format_footnotes(), {"text": "", "files": []}
+            for gen_text, fnotes in self._generate_text_stream(final_prompt, url_input.strip()):
+                yield gen_text, context_text, modification_text, fnotes, _EMPTY_MULTIMODAL
         else:
-            return source_text, context_text, modification_text, self._format_footnotes(), {"text": "", "files": []}
+            for mod_text, fnotes in self._modify_text_stream(text_to_modify, final_prompt, source_text):
+                yield source_text, context_text, mod_text, fnotes, _EMPTY_MULTIMODAL
 
     def _extract_prompt_from_multimodal(self, multimodal_input) -> str:
         """Extract and combine text prompt from multimodal input (audio + text)"""
@@ -171,29 +247,122 @@ class TextEditor:
         # Process audio files
         transcribed_text = ""
         if files:
-            supported_formats = get_supported_formats()
+            audio_files = []
             for file_path in files:
-                if file_path and Path(file_path).suffix.lower() in supported_formats:
-                    print(f"Transcribing: {Path(file_path).name}")
-                    transcription = self.audio_processor.process_audio_file(file_path)
-                    if transcription:
-                        transcribed_text += (" " + transcription.strip()) if transcribed_text else transcription.strip()
+                if file_path and Path(file_path).suffix.lower() in _SUPPORTED_FORMATS:
+                    audio_files.append(file_path)
                 else:
                     print(f"Unsupported format: {Path(file_path).suffix}")
+            
+            # Transcribe all files concurrently, keeping results in upload order
+            if audio_files:
+                transcriptions = list(self._pool.map(self._transcribe_audio, audio_files))
+                transcribed_text = " ".join(t.strip() for t in transcriptions if t)
         
         # Combine transcribed audio with text prompt
         return f"{transcribed_text} {text_prompt}".strip()
 
+    def _transcribe_audio(self, file_path: str):
+        """Transcribe an audio file, reusing the cached transcription for identical content"""
+        try:
+            size = os.stat(file_path).st_size
+        except OSError:
+            size = -1
+        if not CONFIG.MIN_AUDIO_FILE_SIZE <= size <= CONFIG.MAX_AUDIO_FILE_SIZE:
+            # Missing or out-of-range files are rejected by the processor; don't read them to hash
+            return self.audio_processor.process_audio_file(file_path)
+        
+        # Hash in chunks rather than reading the whole upload into memory
+        with open(file_path, "rb") as f:
+            key = hashlib.file_digest(f, lambda: hashlib.blake2b(digest_size=16)).hexdigest()
+        
+        with self._audio_cache_lock:
+            cached = self._audio_cache.get(key)
+        if cached is not None:
+            print(f"Using cached transcription: {Path(file_path).name}")
+            return cached
+        
+        print(f"Transcribing: {Path(file_path).name}")
+        transcription = self.audio_processor.process_audio_file(file_path)
+        if transcription:
+            with self._audio_cache_lock:
+                self._audio_cache[key] = transcription
+        return transcription
+
+    def _load_audio_cache(self) -> dict:
+        """Load persisted transcriptions from disk"""
+        try:
+            with open(self._audio_cache_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_audio_cache(self):
+        """Persist transcriptions to disk"""
+        with self._audio_cache_lock:
+            payload = json.dumps(self._audio_cache)
+        
+        # Write a temp file and swap it in, so a failed write never truncates the existing cache
+        self._audio_cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self._audio_cache_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(payload)
+        os.replace(tmp_path, self._audio_cache_path)
+
     def _generate_text(self, topic: str, url: str = ""):
         """Generate text with optional URL (URL scraping handled by preparation agent)"""
         
         # Generate text using preparation agent (it handles URL scraping internally)
         if url.strip():
             gr.Info(f"Processing with URL: {url}")
-            result = self.prep_agent.generate_text(topic, url.strip())
+            result = self.prep_agent.generate_text(topic, url.strip(), self._take_prefetched_url(url.strip()))
         else:
             result = self.prep_agent.generate_text(topic)
         
+        return self._apply_generation_result(result, url)
+
+    def _generate_text_stream(self, topic: str, url: str = ""):
+        """Streaming variant of _generate_text, yielding (text, footnotes) as tokens arrive"""
+        
+        if url.strip():
+            gr.Info(f"Processing with URL: {url}")
+        # The last streamed result is the fully parsed article
+        scrape_result = self._take_prefetched_url(url.strip()) if url.strip() else None
+        for result in self.prep_agent.generate_text_stream(topic, url.strip(), scrape_result):
+            yield result.get('text', ''), self._format_footnotes()
+        
+        generated_text, _, fnotes = self._apply_generation_result(result, url)
+        yield generated_text, fnotes
+
+    def prefetch_url(self, url: str):
+        """Start scraping a URL in the background so generation can reuse the result"""
+        url = url.strip()
+        now = time.monotonic()
+        with self._url_prefetch_lock:
+            # Drop stale prefetches
+            for key in [k for k, (started, _) in self._url_prefetch.items() if now - started > _URL_PREFETCH_TTL]:
+                del self._url_prefetch[key]
+            
+            if _URL_RE.fullmatch(url) and url not in self._url_prefetch:
+                print(f"Prefetching URL: {url}")
+                self._url_prefetch[url] = (now, self._pool.submit(self.prep_agent.scrape_source, url))
+
+    def _take_prefetched_url(self, url: str) -> Optional[dict]:
+        """Return the scrape result of a prefetched URL, waiting for it if still in flight"""
+        with self._url_prefetch_lock:
+            entry = self._url_prefetch.pop(url, None)
+        if entry is None or time.monotonic() - entry[0] > _URL_PREFETCH_TTL:
+            return None
+        try:
+            result = entry[1].result()
+        except Exception as e:
+            print(f"Prefetch failed for {url}: {e}")
+            return None
+        # A failed prefetch is scraped again by the preparation agent
+        return result if result.get('success') else None
+
+    def _apply_generation_result(self, result: dict, url: str = ""):
+        """Store footnotes from a preparation result and return the panel outputs"""
         generated_text = result.get('text', '')
         
         # This generated text should go into the preparation text box
@@ -210,14 +379,36 @@ class TextEditor:
         # Return to source_text, clear document_text
         return generated_text, self.document.text, self._format_footnotes()
 
-    def _modify_text(self, selected_text: str, prompt: str, document_text: str):
-        if not selected_text.strip():
-            print("No text selected or available in document to modify.")
-            return document_text, self._format_footnotes()
-        # The modification agent returns a string directly, not a dict
-        modified_text = self.mod_agent.modify_text(document_text, selected_text, prompt)
-        print("Text modified successfully")
-        return modified_text, self._format_footnotes()
+    def _modify_text_stream(self, selected_text: str, prompt: str, document_text: str):
+        """Modify the selected text, yielding (text, footnotes) as tokens arrive"""
+        cache_key = self._mod_cache_key(selected_text, prompt, document_text)
+        modified_text = self._get_cached_modification(cache_key)
+        if modified_text is None:
+            # The last streamed value is the fully parsed modified text
+            for modified_text in self.mod_agent.modify_text_stream(document_text, selected_text, prompt):
+                yield modified_text, self._format_footnotes()
+            self._put_cached_modification(cache_key, modified_text)
+            print("Text modified successfully")
+        yield modified_text, self._format_footnotes()
+
+    def _mod_cache_key(self, selected_text: str, prompt: str, document_text: str) -> str:
+        """Cache key for a modification: exact document and selection, normalized prompt"""
+        return hashlib.sha256(f"{document_text}\0{selected_text}".encode("utf-8")).hexdigest() + self._cache_key(prompt)
+
+    def _get_cached_modification(self, cache_key: str) -> Optional[str]:
+        """Return a cached modification result, marking it as most recently used"""
+        modified_text = self._mod_cache.get(cache_key)
+        if modified_text is not None:
+            self._mod_cache.move_to_end(cache_key)
+            print("Using cached modification result")
+        return modified_text
+
+    def _put_cached_modification(self, cache_key: str, modified_text: str):
+        """Cache a modification result, evicting the least recently used beyond _MOD_CACHE_SIZE"""
+        self._mod_cache[cache_key] = modified_text
+        self._mod_cache.move_to_end(cache_key)
+        if len(self._mod_cache) > _MOD_CACHE_SIZE:
+            self._mod_cache.popitem(last=False)
 
     def search_documents(self, query: str):
         """Search documents by summary and return matching filenames"""
@@ -235,10 +426,7 @@ class TextEditor:
             return "", self._format_footnotes()
         
         # Extract filename from display name (format: "filename (date)")
-        if " (" in display_name:
-            filename = display_name.split(" (")[0]
-        else:
-            filename = display_name
+        filename = display_name.partition(" (")[0]
         
         doc = self.storage_manager.load_document(filename)
         if doc:
@@ -289,9 +477,13 @@ class TextEditor:
         
         # Filter footnotes based on checkbox selection if footnotes_data is provided
         if footnotes_data is not None and hasattr(footnotes_data, '__len__') and len(footnotes_data) > 0:
-            # Simple filter: get rows where Save column is True
-            selected_rows = footnotes_data[footnotes_data['Save'] == True]
-            selected_footnotes = selected_rows['References (Only modify this)'].tolist()
+            # Simple filter: get rows where Save column is True (plain iteration, no pandas indexing)
+            if isinstance(footnotes_data, list):
+                selected_footnotes = [row[2] for row in footnotes_data if row[0]]
+            else:
+                saves = footnotes_data[_FOOTNOTE_SAVE_COL].tolist()
+                refs = footnotes_data[_FOOTNOTE_REF_COL].tolist()
+                selected_footnotes = [ref for save, ref in zip(saves, refs) if save]
             
             print(f"DEBUG: Found {len(selected_footnotes)} selected footnotes")
             
@@ -312,22 +504,30 @@ class TextEditor:
     def get_available_files(self) -> List[str]:
         return self.storage_manager.list_documents()
 
-def create_interface():
-    editor = TextEditor()
-    
-    # Register cleanup on exit
-    def cleanup():
-        if hasattr(editor.storage_manager, 'close'):
-            editor.storage_manager.close()
-        if hasattr(editor.audio_processor, 'close'):
-            editor.audio_processor.close()
-        if hasattr(editor.prep_agent, 'close'):
-            editor.prep_agent.close()
-        if hasattr(editor.mod_agent, 'close'):
-            editor.mod_agent.close()
+    def cleanup(self):
+        """Persist caches and close all resources"""
+        steps = [self.save_audio_cache, lambda: self._pool.shutdown(wait=False)]
+        steps += [resource.close for resource in (self.storage_manager, self.audio_processor, self.prep_agent, self.mod_agent)
+                  if hasattr(resource, 'close')]
+        steps.append(close_llm_clients)
+        
+        # Every step runs even if an earlier one fails, so no resource is left open
+        for step in steps:
+            try:
+                step()
+            except Exception as e:
+                print(f"Cleanup step failed: {e}")
         print("All resources cleaned up")
-    
-    atexit.register(cleanup)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.cleanup()
+
+def create_interface(editor: Optional[TextEditor] = None):
+    if editor is None:
+        editor = TextEditor()
 
     css = """
         .main-header { 
@@ -349,7 +549,7 @@ def create_interface():
 
     with gr.Blocks(title="TechEU Editor", theme=gr.themes.Soft(), css=css, fill_width=True) as interface:
         # State variables for tracking selections and panel focus
-        prep_selection = gr.State("")
+        prep_selection = gr.State({"text": "", "start": None, "end": None})
         mod_selection = gr.State("")
         selected_panel = gr.State("preparation")
 
@@ -465,8 +665,8 @@ def create_interface():
 
             with gr.Accordion("Footnotes & Citations", open=False):
                 footnotes_display = gr.Dataframe(
-                    value=[[False, 0, "No footnotes available"]],
-                    headers=["Save", "Index", "References (Only modify this)"],
+                    value=_EMPTY_FOOTNOTE_ROWS,
+                    headers=[_FOOTNOTE_SAVE_COL, "Index", _FOOTNOTE_REF_COL],
                     datatype=["bool", "number", "str"],
                     col_count=(3, "fixed"),
                     row_count=(1, "dynamic"),
@@ -474,9 +674,8 @@ def create_interface():
                     column_widths=["10%", "10%", "80%"]
                 )
 
-        # Get supported audio formats for display
-        supported_formats = get_supported_formats()
-        formats_text = ", ".join(supported_formats)
+        # Get supported audio formats for display (list keeps the configured order)
+        formats_text = ", ".join(get_supported_formats())
         
         with gr.Group():
             url_input = gr.Textbox(
@@ -499,41 +698,40 @@ def create_interface():
             )
 
         # Event Handlers
-        def update_counts(source, context, modification):
-            source_words = editor.get_word_count(source)
-            source_chars = len(source) if source else 0
-            source_lines = source.count('\n') + 1 if source else 0
-            
-            context_words = editor.get_word_count(context)
-            context_chars = len(context) if context else 0
+        def update_source_counts(source):
+            return [list(editor.get_text_stats(source))]
+
+        def update_context_counts(context):
+            context_words, context_chars, _ = editor.get_text_stats(context)
             # Use the actual selection indices from the editor
             selection_range = f"{editor.selection_start}:{editor.selection_end}" if editor.selection_start != 0 or editor.selection_end != 0 else "0:0"
-            
-            modification_words = editor.get_word_count(modification)
-            modification_chars = len(modification) if modification else 0
-            modification_lines = modification.count('\n') + 1 if modification else 0
-            
-            source_data = [[source_words, source_chars, source_lines]]
-            context_data = [[context_words, context_chars, selection_range]]
-            modification_data = [[modification_words, modification_chars, modification_lines]]
-            
-            return source_data, context_data, modification_data
-
-        # Update statistics when text changes
-        source_text.change(update_counts, 
-                          inputs=[source_text, context_text, modification_text], 
-                          outputs=[source_stats, context_stats, modification_stats])
-        context_text.change(update_counts, 
-                           inputs=[source_text, context_text, modification_text], 
-                           outputs=[source_stats, context_stats, modification_stats])
-        modification_text.change(update_counts, 
-                                inputs=[source_text, context_text, modification_text], 
-                                outputs=[source_stats, context_stats, modification_stats])
+            return [[context_words, context_chars, selection_range]]
+
+        def update_modification_counts(modification):
+            return [list(editor.get_text_stats(modification))]
+
+        # Update statistics when text changes; only the changed panel is recomputed, and
+        # only once typing pauses for _STATS_DEBOUNCE_MS
+        source_text.change(update_source_counts, 
+                          inputs=[source_text], 
+                          outputs=[source_stats],
+                          js=_debounce_js("source"))
+        context_text.change(update_context_counts, 
+                           inputs=[context_text], 
+                           outputs=[context_stats],
+                           js=_debounce_js("context"))
+        modification_text.change(update_modification_counts, 
+                                inputs=[modification_text], 
+                                outputs=[modification_stats],
+                                js=_debounce_js("modification"))
         
         # Handle text selection and panel mode switching via header buttons
         def handle_prep_select(evt: gr.SelectData):
             # Auto-switch to preparation mode when clicking source text
-            return evt.value if hasattr(evt, 'value') else "", "preparation", gr.update(variant="primary"), gr.update(variant="secondary")
+            # Keep Gradio's selection offsets so copy_to_context doesn't have to search for them
+            start, end = evt.index if isinstance(getattr(evt, 'index', None), (list, tuple)) else (None, None)
+            selection = {"text": evt.value if hasattr(evt, 'value') else "", "start": start, "end": end}
+            return selection, "preparation", gr.update(variant="primary"), gr.update(variant="secondary")
         
         def handle_mod_select(evt: gr.SelectData):
             # Auto-switch to modification mode when clicking modification text
@@ -560,19 +758,19 @@ def create_interface():
         # Button event handlers
         new_btn.click(editor.new_document, outputs=[source_text, context_text, modification_text, footnotes_display, context_stats])
         copy_btn.click(editor.copy_to_context, inputs=[source_text, prep_selection], outputs=[context_text, context_stats])
-        apply_btn.click(editor.apply_modified, inputs=[source_text, context_text, modification_text], outputs=[source_text])
+        apply_btn.click(editor.apply_modified, inputs=[source_text, context_text, modification_text], outputs=[source_text]).then(
+            update_context_counts, inputs=[context_text], outputs=[context_stats])
         clear_btn.click(editor.clear_document, outputs=[source_text, context_text, modification_text, context_stats])
         
         def handle_execute_action(multimodal_input, source, context, modification, panel, url):
             if not multimodal_input:
-                return source, context, modification, editor._format_footnotes(), {"text": "", "files": []}
+                yield source, context, modification, editor._format_footnotes(), _EMPTY_MULTIMODAL
+                return
             
-            # Execute action based on selected panel
-            new_source, new_context, new_modification, fnotes, updated_multimodal = editor.execute_action(
+            # Execute action based on selected panel, streaming partial output into the textboxes
+            yield from editor.execute_action_stream(
                 multimodal_input, source, context, modification, panel, url
             )
-            
-            return new_source, new_context, new_modification, fnotes, updated_multimodal
 
         multimodal_input.submit(
             handle_execute_action,
@@ -594,14 +792,18 @@ def create_interface():
         search_btn.click(search_and_update_dropdown, inputs=[search_query], outputs=[file_dropdown])
         search_query.submit(search_and_update_dropdown, inputs=[search_query], outputs=[file_dropdown])
         load_btn.click(editor.load_document_to_preparation, inputs=[file_dropdown], outputs=[source_text, footnotes_display])
+        # Start scraping as soon as the user leaves the URL field, ahead of the prompt submit
+        url_input.blur(editor.prefetch_url, inputs=[url_input])
         url_input.submit(editor.generate_from_url, inputs=[url_input], outputs=[source_text, footnotes_display, file_dropdown])
         save_btn.click(save_and_refresh, inputs=[save_filename, footnotes_display, source_text], outputs=[file_dropdown])
     
     return interface
 
 def main():
-    interface = create_interface()
-    interface.launch(server_port=7860)
+    # Resources are released deterministically when the server stops
+    with TextEditor() as editor:
+        interface = create_interface(editor)
+        interface.launch(server_port=7860)
 
 if __name__ == "__main__":
     main()
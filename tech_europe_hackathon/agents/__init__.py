@@ -1,12 +1,19 @@
 """
 AI Agent modules for text preparation and modification
 """
-from .preparation_agent import TextPreparationAgent
-from .modification_agent import TextModificationAgent
-from .url_scraping_agent import URLScrapingAgent
-
-__all__ = [
-    'TextPreparationAgent',
-    'TextModificationAgent',
-    'URLScrapingAgent'
-]
+import importlib
+
+# Agents are resolved lazily (PEP 562) so each one only loads the SDKs it needs
+_EXPORTS = {
+    'TextPreparationAgent': '.preparation_agent',
+    'TextModificationAgent': '.modification_agent',
+    'URLScrapingAgent': '.url_scraping_agent'
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,9 +1,22 @@
 """
 Text Modification Agent with CAG (Context-Aware Generation) Architecture
 """
-from crewai import Agent, Task, Crew, LLM
-from typing import List, Dict, Any, Tuple
-from tech_europe_hackathon.utils.config import CONFIG
+import asyncio
+import json
+import re
+from string import Template
+from typing import List, Dict, Any, Iterator, Tuple
+from tech_europe_hackathon.utils.llm import LLM_MODEL, get_openai_client, get_async_openai_client, create_chat_completion
+
+# Per-request part of the modification prompt (sent after the stable system prefix)
+_MODIFICATION_REQUEST_TEMPLATE = Template(
+    "SUB-TEXT QUERY: $sub_text_query\n"
+    "MODIFICATION PROMPT: $modification_prompt\n"
+    "WORD_COUNT_TOLERANCE: ±$tolerance%"
+)
+
+# Matches the (possibly unterminated) modified_sub_text value in a partially streamed JSON response
+_PARTIAL_MODIFIED_RE = re.compile(r'"modified_sub_text"\s*:\s*"((?:[^"\\]|\\.)*)')
 
 
 class TextModificationAgent:
@@ -13,31 +26,30 @@ class TextModificationAgent:
     """
     
     def __init__(self):
-        # Use CrewAI's LLM wrapper instead of direct OpenAI client
-        self.llm = LLM(
-            model="openai/gpt-4o-mini",
-            api_key=CONFIG.OPENAI_API_KEY
-        )
+        # Single direct chat completion per modification instead of a two-task Crew
+        self.client = get_openai_client()
+        # Async client for concurrent bulk modification
+        self.async_client = get_async_openai_client()
         
-        # Context Analyzer Agent
-        self.context_analyzer = Agent(
-            role='Context Analyzer',
-            goal='Analyze the full source text and identify the sub-text to be modified with its surrounding context',
-            backstory='You are an expert text analyst who understands context and can precisely locate and analyze text segments within larger documents.',
-            verbose=True,
-            allow_delegation=False,
-            llm=self.llm
-        )
-        
-        # Text Modifier Agent
-        self.text_modifier = Agent(
-            role='Context-Aware Text Modifier',
-            goal='Modify the identified sub-text while maintaining context coherence and word count (±20%)',
-            backstory='You are an expert editor who can modify text segments while preserving the overall document flow and maintaining appropriate word count.',
-            verbose=True,
-            allow_delegation=False,
-            llm=self.llm
-        )
+        # Role priming formerly carried by the Context Analyzer and Text Modifier agents,
+        # followed by the fixed task instructions
+        self.system_prompt = """You are an expert text analyst who understands context and can precisely locate and analyze text segments within larger documents. You are also an expert editor who can modify text segments while preserving the overall document flow and maintaining appropriate word count.
+
+Analyze the source text, identify the sub-text matching the user's query and modify it according to the user's prompt.
+
+Tasks:
+1. Locate the exact sub-text that matches the query
+2. Consider the surrounding context (2-3 sentences before and after) and the tone and style of the sub-text
+3. Modify ONLY the identified sub-text, not the surrounding context
+4. Maintain the original word count within the given tolerance
+5. Ensure the modification flows naturally with the surrounding context
+6. Apply the user's modification instructions precisely
+
+Format your response as a JSON object:
+{"modified_sub_text": "[only the modified text]"}
+
+SOURCE TEXT:
+"""
     
     def modify_text(self, source_text: str, sub_text_query: str, modification_prompt: str, word_count_tolerance: float = 0.2) -> str:
         """
@@ -53,66 +65,92 @@ class TextModificationAgent:
             Only the modified sub-text (not the full integrated document)
         """
         
-        # Step 1: Context Analysis Task
-        context_analysis_task = Task(
-            description=f"""
-            Analyze the source text and identify the sub-text to be modified:
-            
-            SOURCE TEXT:
-            {source_text}
-            
-            SUB-TEXT QUERY: {sub_text_query}
-            
-            Tasks:
-            1. Locate the exact sub-text that matches the query
-            2. Identify the surrounding context (2-3 sentences before and after)
-            3. Count the words in the identified sub-text
-            4. Analyze the tone, style, and purpose of the sub-text
-            
-            Format your response as:
-            IDENTIFIED_SUB_TEXT: [exact text found]
-            PRECEDING_CONTEXT: [2-3 sentences before]
-            FOLLOWING_CONTEXT: [2-3 sentences after]
-            TONE_STYLE: [analysis of tone and style]
-            POSITION: [approximate position in source text]
-            """,
-            agent=self.context_analyzer,
-            expected_output="Analysis of sub-text location, context, and characteristics"
+        response = create_chat_completion(
+            self.client,
+            model=LLM_MODEL,
+            response_format={"type": "json_object"},
+            messages=self._build_messages(source_text, sub_text_query, modification_prompt, word_count_tolerance)
         )
-        
-        # Step 2: Text Modification Task
-        modification_task = Task(
-            description=f"""
-            Based on the context analysis, modify the identified sub-text according to the user's prompt:
-            
-            MODIFICATION PROMPT: {modification_prompt}
-            WORD_COUNT_TOLERANCE: ±{int(word_count_tolerance * 100)}%
-            
-            Requirements:
-            1. Modify ONLY the identified sub-text, not the surrounding context
-            2. Maintain the original word count within ±{int(word_count_tolerance * 100)}% tolerance
-            3. Preserve the tone and style identified in the analysis
-            4. Ensure the modification flows naturally with the surrounding context
-            5. Apply the user's modification instructions precisely
-            
-            Format your response as only the modified text without any labels or formatting.
-            """,
-            agent=self.text_modifier,
-            expected_output="Only the modified sub-text"
+        return self._parse_result(response.choices[0].message.content or "")
+    
+    def modify_text_stream(self, source_text: str, sub_text_query: str, modification_prompt: str, word_count_tolerance: float = 0.2) -> Iterator[str]:
+        """Stream the modified sub-text as it is generated; the last yielded value is the final parsed text"""
+        stream = create_chat_completion(
+            self.client,
+            model=LLM_MODEL,
+            stream=True,
+            response_format={"type": "json_object"},
+            messages=self._build_messages(source_text, sub_text_query, modification_prompt, word_count_tolerance)
         )
         
-        # Execute CAG workflow - only need context analysis and modification
-        crew = Crew(
-            agents=[self.context_analyzer, self.text_modifier],
-            tasks=[context_analysis_task, modification_task],
-            share_crew=False,
-            verbose=True
-        )
+        raw = ""
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if not delta:
+                continue
+            raw += delta
+            partial = self._partial_modified_text(raw)
+            if partial:
+                yield partial
+        
+        yield self._parse_result(raw)
+    
+    async def modify_texts(self, items: List[Dict[str, Any]], max_concurrency: int = 50) -> List[Any]:
+        """
+        Modify many sub-texts concurrently
         
-        result = crew.kickoff()
-        return str(result).strip()
+        Args:
+            items: Dicts with the keyword arguments of modify_text
+            max_concurrency: Maximum number of requests in flight
+        
+        Returns:
+            One modified sub-text per item, in order; failed items are returned as their exception
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def modify(item: Dict[str, Any]) -> str:
+            async with semaphore:
+                response = await self.async_client.chat.completions.create(
+                    model=LLM_MODEL,
+                    response_format={"type": "json_object"},
+                    messages=self._build_messages(**item)
+                )
+                return self._parse_result(response.choices[0].message.content or "")
+        
+        return await asyncio.gather(*(modify(item) for item in items), return_exceptions=True)
+    
+    def _build_messages(self, source_text: str, sub_text_query: str, modification_prompt: str, word_count_tolerance: float = 0.2) -> List[Dict[str, str]]:
+        """Build the chat messages for a modification request"""
+        # Stable prefix (instructions + source text) first so repeated edits of the same
+        # document hit OpenAI's automatic prompt caching; per-call details go last
+        return [
+            {"role": "system", "content": self.system_prompt + source_text},
+            {"role": "user", "content": _MODIFICATION_REQUEST_TEMPLATE.substitute(
+                sub_text_query=sub_text_query,
+                modification_prompt=modification_prompt,
+                tolerance=int(word_count_tolerance * 100)
+            )}
+        ]
+    
+    def _partial_modified_text(self, raw: str) -> str:
+        """Decode as much of the modified sub-text as has been streamed so far"""
+        match = _PARTIAL_MODIFIED_RE.search(raw)
+        if not match:
+            return ""
+        try:
+            return json.loads(f'"{match.group(1)}"')
+        except ValueError:
+            # Cut inside an escape sequence; wait for the next chunk
+            return ""
+    
+    def _parse_result(self, result: str) -> str:
+        """Extract the modified sub-text from the JSON response"""
+        try:
+            return str(json.loads(result).get("modified_sub_text", "")).strip()
+        except (ValueError, AttributeError):
+            # Not valid JSON; fall back to the raw response
+            return result.strip()
     
     def close(self):
         """Close resources properly"""
-        if hasattr(self.llm, 'close'):
-            self.llm.close()
+        # LLM clients are shared across agents and closed via close_llm_clients()
@@ -1,66 +1,33 @@
 import warnings
 warnings.filterwarnings("ignore", category=UserWarning, module="pydantic")
 
-from crewai import Agent, Task, Crew, LLM
-from typing import List, Dict, Any
-from tech_europe_hackathon.utils.config import CONFIG
+import asyncio
+import json
+import re
+import time
+from string import Template
+from typing import List, Dict, Any, Iterator, Optional
+from tech_europe_hackathon.utils.cache import SemanticCache
+from tech_europe_hackathon.utils.llm import LLM_MODEL, get_llm, get_openai_client, get_async_openai_client, call_llm, create_chat_completion
 from tech_europe_hackathon.agents.url_scraping_agent import URLScrapingAgent, search_tool
 
+# Result sections, extracted in single regex passes
+_ARTICLE_RE = re.compile(r"^[ \t]*ARTICLE:(.*?)(?=^[ \t]*(?:WORD_COUNT:|CITATIONS:)|\Z)", re.S | re.M)
+_WORD_COUNT_RE = re.compile(r"^[ \t]*WORD_COUNT:[ \t]*(\d+)[ \t\r]*$", re.M)
+_CITATIONS_RE = re.compile(r"^[ \t]*CITATIONS:(.*)", re.S | re.M)
+_CITATION_LINE_RE = re.compile(r"^[ \t]*(\[.*?)[ \t\r]*$", re.M)
+_MARKER_RE = re.compile(r"^[ \t]*(?:WORD_COUNT:|CITATIONS:)", re.M)
+# Section markers that end the article while streaming
+_STREAM_MARKERS = ("WORD_COUNT:", "CITATIONS:")
 
-class TextPreparationAgent:
-    """Simplified multi-agent system for research-based text generation"""
-    
-    def __init__(self):
-        self.url_scraper = URLScrapingAgent()
-        
-        # Use CrewAI's LLM wrapper instead of direct OpenAI client
-        self.llm = LLM(
-            model="openai/gpt-4o-mini",
-            api_key=CONFIG.OPENAI_API_KEY
-        )
-        
-        # Create a single comprehensive agent without search tools for now
-        self.research_agent = Agent(
-            role='Research Writer',
-            goal='Create well-researched 150-200 word articles with citations',
-            backstory='You are an expert researcher and writer who creates comprehensive, well-cited content using your knowledge base.',
-            verbose=False,  # Reduce verbosity for faster processing
-            allow_delegation=False,
-            tools=[],  # No external search tools for now
-            llm=self.llm
-        )
-    
-    def generate_text(self, topic: str, source_url: str = None) -> Dict[str, Any]:
-        """Generate comprehensive text using simplified workflow with optional URL scraping"""
-        
-        url_content = None
-        
-                # If URL is provided, scrape it first using the URL scraper agent
-        if source_url and source_url.strip():
-            print(f"Scraping content from URL: {source_url}")
-            # Use a smaller word count for faster processing
-            scrape_result = self.url_scraper.scrape_and_summarize(source_url.strip(), target_words=100)
-            if scrape_result.get('success', False):
-                url_content = scrape_result.get('summary', '')
-                print(f"Successfully scraped {scrape_result.get('summary_word_count', 0)} words from URL")
-            else:
-                print(f"Failed to scrape URL: {source_url}")
-        
-        # Prepare the description based on whether URL content was successfully scraped
-        if url_content:
-            task_description = f"""
-            Write a comprehensive 150-200 word article about: {topic}
-            
-            Context provided here
-            ---
-            {url_content}
-            ---
+# Research task prompts: fixed instructions first, per-request topic/context last,
+# so every request shares the same prompt prefix
+_ARTICLE_TEMPLATE = Template("""
+            Write a comprehensive 150-200 word article about the topic below.
             
             Steps:
-            1. Use the provided context along with your knowledge to write a 150-200 word article
-            2. Incorporate relevant information from the context
-            3. Include 2-5 correct citations with URLs in the format [1] Description - URL
-            4. ALWAYS include the source URL ({source_url}) as one of your citations
+            1. Use your knowledge to write a 150-200 word article with key facts and statistics
+            2. Include 2-5 correct citations with URLs in the format [1] Description - URL
             
             Format your response as:
             ARTICLE: [Your 150-200 word article with citation markers like [1], [2]]
@@ -68,18 +35,22 @@ class TextPreparationAgent:
             WORD_COUNT: [actual word count of the article]
             
             CITATIONS:
-            [1] Context used from - {source_url}
+            [1] Source description - https://example.com/source1
             [2] Source description - https://example.com/source2
             [3] Source description - https://example.com/source3
             [etc.]
-            """
-        else:
-            task_description = f"""
-            Write a comprehensive 150-200 word article about: {topic}
+            
+            TOPIC: $topic
+            """)
+
+_ARTICLE_WITH_CONTEXT_TEMPLATE = Template("""
+            Write a comprehensive 150-200 word article about the topic below.
             
             Steps:
-            1. Use your knowledge to write a 150-200 word article with key facts and statistics
-            2. Include 2-5 correct citations with URLs in the format [1] Description - URL
+            1. Use the provided context along with your knowledge to write a 150-200 word article
+            2. Incorporate relevant information from the context
+            3. Include 2-5 correct citations with URLs in the format [1] Description - URL
+            4. ALWAYS include the source URL as one of your citations
             
             Format your response as:
             ARTICLE: [Your 150-200 word article with citation markers like [1], [2]]
@@ -87,29 +58,213 @@ class TextPreparationAgent:
             WORD_COUNT: [actual word count of the article]
             
             CITATIONS:
-            [1] Source description - https://example.com/source1
+            [1] Context used from - [source URL]
             [2] Source description - https://example.com/source2
             [3] Source description - https://example.com/source3
             [etc.]
-            """
+            
+            SOURCE URL: $source_url
+            
+            Context provided here
+            ---
+            $url_content
+            ---
+            
+            TOPIC: $topic
+            """)
+
+
+class TextPreparationAgent:
+    """Simplified multi-agent system for research-based text generation"""
+    
+    def __init__(self, cache: Optional[SemanticCache] = None):
+        self.cache = cache
+        self.url_scraper = URLScrapingAgent(cache=cache)
         
-        # Single comprehensive task
-        research_task = Task(
-            description=task_description,
-            agent=self.research_agent,
-            expected_output="150-200 word article with citations"
-        )
+        # Shared CrewAI LLM wrapper (one connection pool for all agents)
+        self.llm = get_llm()
+        # Direct OpenAI client for token streaming
+        self.client = get_openai_client()
+        # Async client for concurrent bulk generation
+        self.async_client = get_async_openai_client()
+        
+        # Research writer role; no tools are needed, so the LLM is called directly
+        self.system_prompt = 'You are a Research Writer. You are an expert researcher and writer who creates comprehensive, well-cited content using your knowledge base.'
+    
+    def generate_text(self, topic: str, source_url: str = None, scrape_result: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Generate comprehensive text using simplified workflow with optional URL scraping"""
+        
+        cached = self._get_cached(topic, source_url)
+        if cached is not None:
+            return cached
+        
+        task_description = self._build_task_description(topic, source_url, scrape_result)
+        
+        # Single LLM call (a one-agent Crew without tools adds orchestration overhead only)
+        result = self._parse_result(call_llm(self.llm, self._build_messages(task_description)), topic)
+        self._put_cached(topic, source_url, result)
+        return result
+
+    def generate_text_stream(self, topic: str, source_url: str = None, scrape_result: Dict[str, Any] = None) -> Iterator[Dict[str, Any]]:
+        """Stream the article as it is generated; the last yielded result is fully parsed"""
+        
+        cached = self._get_cached(topic, source_url)
+        if cached is not None:
+            yield cached
+            return
         
-        # Execute the task
-        crew = Crew(
-            agents=[self.research_agent],
-            tasks=[research_task],
-            share_crew=False,
-            verbose=True
+        task_description = self._build_task_description(topic, source_url, scrape_result)
+        
+        stream = create_chat_completion(
+            self.client,
+            model=LLM_MODEL,
+            stream=True,
+            messages=self._build_messages(task_description)
         )
         
-        result = crew.kickoff()
-        return self._parse_result(str(result), topic)
+        raw = ""
+        for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if not delta:
+                continue
+            raw += delta
+            yield {"text": self._partial_article(raw), "footnotes": [], "topic": topic}
+        
+        result = self._parse_result(raw, topic)
+        self._put_cached(topic, source_url, result)
+        yield result
+
+    async def generate_texts(self, items: List[Dict[str, Any]], max_concurrency: int = 50) -> List[Any]:
+        """
+        Generate articles for many items concurrently
+        
+        Args:
+            items: Dicts with a "topic" and optional "source_url"
+            max_concurrency: Maximum number of requests in flight
+        
+        Returns:
+            One parsed result per item, in order; failed items are returned as their exception
+        """
+        semaphore = asyncio.Semaphore(max_concurrency)
+        
+        async def generate(item: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                topic = item["topic"]
+                # URL scraping goes through the sync ACI client
+                task_description = await asyncio.to_thread(self._build_task_description, topic, item.get("source_url"))
+                response = await self.async_client.chat.completions.create(
+                    model=LLM_MODEL,
+                    messages=self._build_messages(task_description)
+                )
+                return self._parse_result(response.choices[0].message.content or "", topic)
+        
+        return await asyncio.gather(*(generate(item) for item in items), return_exceptions=True)
+
+    def generate_texts_offline(self, items: List[Dict[str, Any]], poll_interval: int = 60) -> List[Optional[Dict[str, Any]]]:
+        """
+        Generate articles for many items through the OpenAI Batch API (lower cost, up to 24h turnaround)
+        
+        Args:
+            items: Dicts with a "topic" and optional "source_url"
+            poll_interval: Seconds between batch status checks
+        
+        Returns:
+            One parsed result per item, in order; None for items the batch did not complete
+        """
+        requests = [
+            json.dumps({
+                "custom_id": str(i),
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {
+                    "model": LLM_MODEL,
+                    "messages": self._build_messages(self._build_task_description(item["topic"], item.get("source_url")))
+                }
+            })
+            for i, item in enumerate(items)
+        ]
+        
+        batch_file = self.client.files.create(file=("requests.jsonl", "\n".join(requests).encode("utf-8")), purpose="batch")
+        batch = self.client.batches.create(input_file_id=batch_file.id, endpoint="/v1/chat/completions", completion_window="24h")
+        print(f"Submitted batch {batch.id} with {len(items)} requests")
+        
+        while batch.status not in ("completed", "failed", "expired", "cancelled"):
+            time.sleep(poll_interval)
+            batch = self.client.batches.retrieve(batch.id)
+        print(f"Batch {batch.id} finished with status '{batch.status}'")
+        
+        results = [None] * len(items)
+        if batch.output_file_id:
+            for line in self.client.files.content(batch.output_file_id).text.splitlines():
+                record = json.loads(line)
+                index = int(record["custom_id"])
+                choices = ((record.get("response") or {}).get("body") or {}).get("choices")
+                if choices:
+                    results[index] = self._parse_result(choices[0]["message"]["content"] or "", items[index]["topic"])
+        return results
+
+    def _build_messages(self, task_description: str) -> List[Dict[str, str]]:
+        """Chat messages for a research task, primed with the research writer role"""
+        return [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": task_description}
+        ]
+
+    def _get_cached(self, topic: str, source_url: str = None) -> Optional[Dict[str, Any]]:
+        """Look up an earlier request with a semantically similar topic and the same source URL"""
+        if not self.cache:
+            return None
+        # Only the topic is matched semantically; different URLs must never share an article
+        cached = self.cache.get(topic, scope=(source_url or '').strip())
+        if cached is not None:
+            print(f"Using cached article for: {topic[:80]}")
+        return cached
+
+    def _put_cached(self, topic: str, source_url: str, result: Dict[str, Any]):
+        """Store a generated article in the semantic cache"""
+        if self.cache:
+            self.cache.put(topic, result, scope=(source_url or '').strip())
+
+    def scrape_source(self, source_url: str) -> Dict[str, Any]:
+        """Scrape and summarize a source URL for use as article context"""
+        print(f"Scraping content from URL: {source_url}")
+        # Use a smaller word count for faster processing
+        return self.url_scraper.scrape_and_summarize(source_url.strip(), target_words=100)
+
+    def _build_task_description(self, topic: str, source_url: str = None, scrape_result: Dict[str, Any] = None) -> str:
+        """Scrape the optional source URL (unless already scraped) and build the research task prompt"""
+        
+        url_content = None
+        
+        # If URL is provided, scrape it first using the URL scraper agent
+        if source_url and source_url.strip():
+            if scrape_result is None:
+                scrape_result = self.scrape_source(source_url)
+            if scrape_result.get('success', False):
+                url_content = scrape_result.get('summary', '')
+                print(f"Successfully scraped {scrape_result.get('summary_word_count', 0)} words from URL")
+            else:
+                print(f"Failed to scrape URL: {source_url}")
+        
+        # Prepare the description based on whether URL content was successfully scraped
+        if url_content:
+            return _ARTICLE_WITH_CONTEXT_TEMPLATE.substitute(topic=topic, url_content=url_content, source_url=source_url)
+        return _ARTICLE_TEMPLATE.substitute(topic=topic)
+
+    def _partial_article(self, raw: str) -> str:
+        """Extract the article body from a partially streamed response"""
+        _, found, article = raw.partition("ARTICLE:")
+        # Nothing to show until the article has started
+        if not found:
+            return ""
+        for marker in _STREAM_MARKERS:
+            article = article.split(marker, 1)[0]
+        # Hide a trailing marker line that has only partially arrived (e.g. "WORD_COU")
+        head, _, last_line = article.rpartition("\n")
+        last_line = last_line.strip()
+        if last_line and any(marker.startswith(last_line) for marker in _STREAM_MARKERS):
+            article = head
+        return article.strip()
 
     def _parse_result(self, result: str, topic: str) -> Dict[str, Any]:
         """Parse the result into structured format"""
@@ -122,54 +277,22 @@ class TextPreparationAgent:
         else:
             result = str(result)
         
-        lines = result.split('\n')
-        article = ""
-        citations = []
-        word_count = 0
-        
-        current_section = None
-        
-        for line in lines:
-            line = line.strip()
-            if line.startswith("ARTICLE:"):
-                current_section = "article"
-                article = line.replace("ARTICLE:", "").strip()
-            elif line.startswith("CITATIONS:"):
-                current_section = "citations"
-            elif line.startswith("WORD_COUNT:"):
-                word_count_str = line.replace("WORD_COUNT:", "").strip()
-                word_count = int(word_count_str) if word_count_str.isdigit() else 0
-            elif current_section == "article" and line:
-                article += " " + line
-            elif current_section == "citations" and line.startswith("["):
-                citations.append(line)
+        # Article body runs from ARTICLE: up to the next WORD_COUNT:/CITATIONS: marker line
+        match = _ARTICLE_RE.search(result)
+        article = " ".join(line.strip() for line in match.group(1).splitlines() if line.strip()) if match else ""
+        
+        word_count_match = _WORD_COUNT_RE.search(result)
+        word_count = int(word_count_match.group(1)) if word_count_match else 0
+        
+        citations_match = _CITATIONS_RE.search(result)
+        citations = _CITATION_LINE_RE.findall(citations_match.group(1)) if citations_match else []
         
         # If no structured format found, extract article from the full text
-        if not article.strip() and result.strip():
-            # Split by common markers to extract just the main content
-            content_lines = result.split('\n')
-            article_lines = []
-            
-            for line in content_lines:
-                line = line.strip()
-                # Stop when we hit formatting markers
-                if line.startswith('WORD_COUNT:') or line.startswith('CITATIONS:'):
-                    break
-                # Skip empty lines at the start
-                if line or article_lines:
-                    article_lines.append(line)
-            
-            article = '\n'.join(article_lines).strip()
-            
-            # Extract citations from the original result
-            citation_section = False
-            for line in content_lines:
-                line = line.strip()
-                if line.startswith('CITATIONS:'):
-                    citation_section = True
-                    continue
-                if citation_section and line.startswith('['):
-                    citations.append(line)
+        if not article and result.strip():
+            # Everything before the first formatting marker is the main content
+            marker = _MARKER_RE.search(result)
+            head = result[:marker.start()] if marker else result
+            article = '\n'.join(line.strip() for line in head.splitlines()).strip()
             
             # If no citations found, generate default ones
             if not citations:
@@ -196,7 +319,6 @@ class TextPreparationAgent:
     
     def close(self):
         """Close resources properly"""
-        if hasattr(self.llm, 'close'):
-            self.llm.close()
+        # LLM clients are shared across agents and closed via close_llm_clients()
         if hasattr(self.url_scraper, 'close'):
             self.url_scraper.close()
@@ -4,28 +4,70 @@ URL Scraping AI Agent with ACI.dev integration
 import warnings
 warnings.filterwarnings("ignore", category=UserWarning, module="pydantic")
 
-import json
-from typing import Dict, Any
-from crewai import Agent, Task, Crew, LLM
+import asyncio
+import functools
+import orjson
+from string import Template
+from typing import Dict, Any, List, Optional, TYPE_CHECKING
+from urllib.parse import urlsplit, urlunsplit
 from crewai.tools import tool
 from tech_europe_hackathon.utils.config import CONFIG
-from aci import ACI
+from tech_europe_hackathon.utils.cache import SemanticCache
+from tech_europe_hackathon.utils.llm import get_llm, call_llm
+from tech_europe_hackathon.utils.resilience import resilient, ACI_BREAKER
+from tech_europe_hackathon.utils.text_prep import extractive_prefilter
+
+if TYPE_CHECKING:
+    from aci import ACI
+
+# Summarization prompt: fixed instructions first, scraped content last
+_SUMMARY_TEMPLATE = Template("""
+            Summarize the content scraped from the URL below.
+            
+            Instructions:
+            1. Create a concise $target_words-word summary focusing on key points only
+            2. If content is too long, focus on the introduction and main concepts
+            3. Keep it factual and informative
+            
+            Return ONLY the summary text, no extra formatting.
+            Maximum $target_words words.
+            
+            URL: $url
+            
+            CONTENT:
+            $content
+            """)
+
+
+@functools.lru_cache(maxsize=1)
+def get_aci_client() -> "ACI":
+    """Shared ACI client so HTTP sessions and connections are reused across tool calls"""
+    from aci import ACI
+    return ACI(api_key=CONFIG.ACI_API_KEY)
+
+
+@resilient(ACI_BREAKER)
+def _execute_aci(function_name: str, function_arguments: Dict[str, Any]) -> Any:
+    """Execute an ACI.dev function, retrying transient failures"""
+    return get_aci_client().functions.execute(
+        function_name=function_name,
+        function_arguments=function_arguments,
+        linked_account_owner_id=CONFIG.LINKED_ACCOUNT_OWNER_ID
+    )
 
 
 @tool
 def search_tool(query: str) -> str:
     """Search the web using ACI.dev BRAVE_SEARCH"""
-    aci = ACI(api_key=CONFIG.ACI_API_KEY)
-    
     # Execute BRAVE_SEARCH__WEB_SEARCH
-    result = aci.functions.execute(
+    result = _execute_aci(
         function_name="BRAVE_SEARCH__WEB_SEARCH",
-        function_arguments={"query": {"q": query}},
-        linked_account_owner_id=CONFIG.LINKED_ACCOUNT_OWNER_ID
+        function_arguments={"query": {"q": query}}
     )
     
     if result.success:
-        return json.dumps(result.data, indent=2)
+        # Compact output: indentation only adds tokens for the consuming LLM
+        return orjson.dumps(result.data).decode()
     else:
         return f"Search error: {result.error}"
 
@@ -33,10 +75,8 @@ def search_tool(query: str) -> str:
 @tool
 def scrape_url(url: str) -> str:
     """Scrape URL content using ACI.dev tools"""
-    aci = ACI(api_key=CONFIG.ACI_API_KEY)
-    
     # Use ACI.dev web scraping function with correct parameter structure
-    result = aci.functions.execute(
+    result = _execute_aci(
         function_name="FIRECRAWL__EXTRACT",
         function_arguments={
             'body': {
@@ -48,69 +88,78 @@ def scrape_url(url: str) -> str:
                     "blockAds": True
                 }
             }
-        },
-        linked_account_owner_id=CONFIG.LINKED_ACCOUNT_OWNER_ID
+        }
     )
     
     if result.success:
-        return json.dumps(result.data, indent=2)
+        return orjson.dumps(result.data).decode()
     else:
         return f"Scraping error: {result.error}"
 
 
+async def scrape_url_async(url: str) -> str:
+    """Scrape a URL without blocking the event loop"""
+    # The ACI SDK is synchronous; run it in a worker thread on the shared client
+    return await asyncio.to_thread(scrape_url.func, url)
+
+
+async def scrape_urls_async(urls: List[str]) -> List[str]:
+    """Scrape several URLs concurrently, returning results in input order"""
+    return await asyncio.gather(*(scrape_url_async(url) for url in urls))
+
+
+def _canonicalize_url(url: str) -> str:
+    """Normalize a URL for cache lookups (case-insensitive scheme/host, no fragment or trailing slash)"""
+    parts = urlsplit(url.strip())
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip('/'), parts.query, ""))
+
+
 class URLScrapingAgent:
     """URL Scraping Agent using only ACI.dev tools"""
     
-    def __init__(self):
-        # Use CrewAI's LLM wrapper instead of direct OpenAI client
-        self.llm = LLM(
-            model="openai/gpt-4o-mini",
-            api_key=CONFIG.OPENAI_API_KEY
-        )
+    def __init__(self, cache: Optional[SemanticCache] = None):
+        self.cache = cache
         
-        self.scraper = Agent(
-            role='Web Content Scraper',
-            goal='Extract and summarize web content efficiently',
-            backstory='You are an expert at quickly extracting key information from web pages and creating concise summaries.',
-            verbose=True,
-            allow_delegation=False,
-            tools=[scrape_url],  # Only use scrape_url, remove search_tool for faster processing
-            llm=self.llm
-        )
+        # Shared CrewAI LLM wrapper (one connection pool for all agents)
+        self.llm = get_llm()
+        
+        self.system_prompt = 'You are an expert at quickly extracting key information from web pages and creating concise summaries.'
     
     def scrape_and_summarize(self, url: str, target_words: int = None) -> Dict[str, Any]:
         """Scrape URL and create a summary using ACI.dev tools"""
         if target_words is None:
             target_words = min(CONFIG.MAX_SCRAPING_WORDS, 150)
         
-        # Create a more efficient scraping and summarization task
-        scraping_task = Task(
-            description=f"""
-            Scrape and summarize content from: {url}
+        # URLs must match exactly; similar URLs can point to unrelated pages
+        cache_key = f"{_canonicalize_url(url)}|{target_words}"
+        if self.cache:
+            cached = self.cache.get(cache_key, exact=True)
+            if cached is not None:
+                print(f"Using cached summary for {url}")
+                return cached
+        
+        failed = {"url": url, "summary": "", "success": False, "method": "aci_tools", "summary_word_count": 0}
+        
+        # Scrape directly with the tool function, then summarize with one LLM call.
+        # Errors are reported as a failed scrape so the article is still generated without the URL content.
+        try:
+            raw = scrape_url.func(url)
+            if raw.startswith("Scraping error:"):
+                print(raw)
+                return failed
             
-            Instructions:
-            1. Use scrape_url tool to get content
-            2. Create a concise {target_words}-word summary focusing on key points only
-            3. If content is too long, focus on the introduction and main concepts
-            4. Keep it factual and informative
+            # Keep only the most informative sentences of long pages to cut prompt tokens
+            raw = extractive_prefilter(raw, max_tokens=2000)
             
-            Return ONLY the summary text, no tool outputs or extra formatting.
-            Maximum {target_words} words.
-            """,
-            agent=self.scraper,
-            expected_output=f"Clean {target_words}-word summary text"
-        )
-        
-        # Execute scraping and summarization with reduced verbosity
-        crew = Crew(
-            agents=[self.scraper],
-            tasks=[scraping_task],
-            share_crew=False,
-            verbose=False  # Reduce verbosity for faster processing
-        )
+            summary = call_llm(self.llm, [
+                {"role": "system", "content": self.system_prompt},
+                {"role": "user", "content": _SUMMARY_TEMPLATE.substitute(target_words=target_words, url=url, content=raw)}
+            ])
+        except Exception as e:
+            print(f"Scraping error: {e}")
+            return failed
         
-        summary = crew.kickoff()
-        return {
+        result = {
             "url": url,
             "title": f"Content from {url.split('/')[2] if '/' in url else url}",
             "summary": str(summary).strip(),
@@ -118,8 +167,10 @@ class URLScrapingAgent:
             "method": "aci_tools",
             "summary_word_count": len(str(summary).split())
         }
+        if self.cache:
+            self.cache.put(cache_key, result)
+        return result
     
     def close(self):
         """Close resources properly"""
-        if hasattr(self.llm, 'close'):
-            self.llm.close()
+        # The LLM client is shared across agents and closed via close_llm_clients()
@@ -1,14 +1,26 @@
 """
 Utility modules for the AI Text Modification System
 """
-from .config import CONFIG
-from .document import TextDocument, StorageManager
-from .audio import AudioProcessor, get_supported_formats
-
-__all__ = [
-    'CONFIG',
-    'TextDocument',
-    'StorageManager',
-    'AudioProcessor',
-    'get_supported_formats'
-]
\ No newline at end of file
+import importlib
+
+# Exports are resolved lazily (PEP 562) so importing one utility does not pull in
+# the SDKs (weaviate, elevenlabs, crewai) used by the others
+_EXPORTS = {
+    'CONFIG': '.config',
+    'TextDocument': '.document',
+    'StorageManager': '.document',
+    'AudioProcessor': '.audio',
+    'get_supported_formats': '.audio',
+    'SemanticCache': '.cache',
+    'get_llm': '.llm',
+    'close_llm_clients': '.llm',
+    'extractive_prefilter': '.text_prep'
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
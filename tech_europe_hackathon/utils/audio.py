@@ -1,10 +1,17 @@
 """
 Simple audio processing using ElevenLabs - File Upload Mode Only
 """
-from typing import Optional, Union
+import os
+from typing import Optional, Union, TYPE_CHECKING
 from pathlib import Path
-from elevenlabs import ElevenLabs
 from tech_europe_hackathon.utils.config import CONFIG
+from tech_europe_hackathon.utils.resilience import resilient, ELEVENLABS_BREAKER
+
+if TYPE_CHECKING:
+    from elevenlabs import ElevenLabs
+
+# Supported extensions as a set for O(1) membership checks
+_SUPPORTED = frozenset(CONFIG.SUPPORTED_AUDIO_FORMATS)
 
 
 class AudioProcessor:
@@ -14,25 +21,42 @@ class AudioProcessor:
         self._client = None
     
     @property
-    def client(self) -> ElevenLabs:
+    def client(self) -> "ElevenLabs":
         """Get ElevenLabs client"""
         if self._client is None:
             if not CONFIG.ELEVENLABS_API_KEY:
                 raise ValueError("ElevenLabs API key not found")
+            # Imported on first use to keep the SDK out of module import time
+            from elevenlabs import ElevenLabs
             self._client = ElevenLabs(api_key=CONFIG.ELEVENLABS_API_KEY)
         return self._client
     
+    @resilient(ELEVENLABS_BREAKER)
     def process_audio_file(self, file_path: Union[str, Path]) -> Optional[str]:
         """Process audio file and return transcribed text"""
         file_path = Path(file_path)
 
-        if not file_path.exists() or file_path.suffix.lower() not in get_supported_formats():
-            print(f"Unsupported file format or file not found: {file_path}")
+        # Format check first (no syscall), then a single stat for existence and size
+        if file_path.suffix.lower() not in _SUPPORTED:
+            print(f"Unsupported file format: {file_path}")
+            return None
+        
+        try:
+            size = os.stat(file_path).st_size
+        except OSError:
+            print(f"File not found: {file_path}")
+            return None
+        
+        # Reject empty/truncated and oversize files before spending upload bandwidth on them
+        if not CONFIG.MIN_AUDIO_FILE_SIZE <= size <= CONFIG.MAX_AUDIO_FILE_SIZE:
+            print(f"Audio file size {size} bytes is outside {CONFIG.MIN_AUDIO_FILE_SIZE}-{CONFIG.MAX_AUDIO_FILE_SIZE} bytes: {file_path}")
             return None
         
-        # Use the speech_to_text client correctly - pass file path directly
-        transcript = self.client.speech_to_text.convert(file=str(file_path), model_id=CONFIG.ELEVENLABS_MODEL_ID)
-        return transcript
+        # Pass an open file so the SDK streams it into the multipart upload
+        with open(file_path, "rb") as f:
+            transcript = self.client.speech_to_text.convert(file=f, model_id=CONFIG.ELEVENLABS_MODEL_ID)
+        # convert() returns a response model; callers (and the transcription cache) need the text
+        return transcript.text
     
     def close(self):
         """Close ElevenLabs client if needed"""
@@ -0,0 +1,127 @@
+"""
+Semantic response cache for agent results, stored in Weaviate
+"""
+import json
+import time
+from typing import Dict, Any, Optional
+
+# Exact-match properties, stored verbatim (FIELD tokenization) and not vectorized:
+# "exact_key" is a copy of key_text for exact lookups, "scope" must match exactly
+# alongside a semantic lookup (e.g. the source URL of an article)
+_EXACT_PROPERTIES = ("exact_key", "scope")
+# Stored for entries without a scope (an empty string has no token to filter on)
+_NO_SCOPE = "-"
+# Candidates fetched per lookup
+_CANDIDATES = 5
+# Minimum seconds between purges of expired entries
+_PURGE_INTERVAL = 600
+
+
+def _exact_property(name: str):
+    """Property definition for an exact-match field"""
+    import weaviate.classes.config as wvc
+    return wvc.Property(name=name, data_type=wvc.DataType.TEXT, tokenization=wvc.Tokenization.FIELD,
+                        skip_vectorization=True, index_searchable=False)
+
+
+class SemanticCache:
+    """Weaviate-backed cache that matches keys by embedding distance (or exactly), with TTL expiry"""
+
+    def __init__(self, client, collection_name: str = "AgentCache", ttl: int = 3600, distance: float = 0.15):
+        self.client = client
+        self.collection_name = collection_name
+        self.ttl = ttl
+        self.distance = distance
+        self._last_purge = 0.0
+        self._create_collection()
+        self._collection = self.client.collections.get(self.collection_name)
+
+    def _create_collection(self):
+        """Create the cache collection in Weaviate"""
+        import weaviate.classes.config as wvc
+        
+        if self.client.collections.exists(self.collection_name):
+            # Collections created before the exact-match properties existed get them added
+            collection = self.client.collections.get(self.collection_name)
+            existing = {prop.name for prop in collection.config.get().properties}
+            for name in _EXACT_PROPERTIES:
+                if name not in existing:
+                    collection.config.add_property(_exact_property(name))
+            return
+
+        self.client.collections.create(
+            name=self.collection_name,
+            properties=[
+                wvc.Property(name="key_text", data_type=wvc.DataType.TEXT),
+                wvc.Property(name="payload", data_type=wvc.DataType.TEXT, skip_vectorization=True),
+                wvc.Property(name="expires_at", data_type=wvc.DataType.NUMBER, skip_vectorization=True),
+                *(_exact_property(name) for name in _EXACT_PROPERTIES)
+            ],
+            vectorizer_config=wvc.Configure.Vectorizer.text2vec_openai(
+                model="text-embedding-3-small",
+                vectorize_collection_name=False
+            )
+        )
+        print(f"Created collection '{self.collection_name}' for agent response caching")
+
+    def get(self, key_text: str, exact: bool = False, scope: str = "") -> Optional[Dict[str, Any]]:
+        """
+        Return the cached payload for key_text, or None on miss/expiry
+
+        Args:
+            key_text: Lookup key, matched by embedding distance unless exact is set
+            exact: Match key_text verbatim instead of semantically
+            scope: Value the entry's scope must equal exactly
+        """
+        import weaviate.classes.query as wvq
+        
+        scope = scope or _NO_SCOPE
+        now = time.time()
+        # Expired entries are excluded server-side so they can't crowd out the live one
+        filters = wvq.Filter.by_property("scope").equal(scope) & wvq.Filter.by_property("expires_at").greater_than(now)
+        try:
+            if exact:
+                response = self._collection.query.fetch_objects(
+                    filters=filters & wvq.Filter.by_property("exact_key").equal(key_text), limit=_CANDIDATES
+                )
+            else:
+                response = self._collection.query.near_text(
+                    query=key_text, filters=filters, limit=_CANDIDATES, distance=self.distance
+                )
+
+            for obj in response.objects:
+                properties = obj.properties
+                if properties.get("scope") != scope or (exact and properties.get("key_text") != key_text):
+                    continue
+                if properties.get("expires_at", 0) > now:
+                    return json.loads(properties["payload"])
+        except Exception as e:
+            print(f"Cache lookup failed: {e}")
+        return None
+
+    def put(self, key_text: str, payload: Dict[str, Any], scope: str = ""):
+        """Store a payload under key_text (and scope)"""
+        try:
+            self._collection.data.insert(properties={
+                "key_text": key_text,
+                "exact_key": key_text,
+                "scope": scope or _NO_SCOPE,
+                "payload": json.dumps(payload),
+                "expires_at": time.time() + self.ttl
+            })
+        except Exception as e:
+            print(f"Cache store failed: {e}")
+        self._purge_expired()
+
+    def _purge_expired(self):
+        """Delete expired entries, at most once per _PURGE_INTERVAL"""
+        now = time.time()
+        if now - self._last_purge < _PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        
+        import weaviate.classes.query as wvq
+        try:
+            self._collection.data.delete_many(where=wvq.Filter.by_property("expires_at").less_or_equal(now))
+        except Exception as e:
+            print(f"Cache purge failed: {e}")
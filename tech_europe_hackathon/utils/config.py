@@ -25,6 +25,7 @@ class Config:
     # Model Configuration
     DEFAULT_LLM_MODEL: str = os.getenv("DEFAULT_LLM_MODEL", "gpt-3.5-turbo")
     DEFAULT_VOICE_MODEL: str = os.getenv("DEFAULT_VOICE_MODEL", "eleven_monolingual_v1")
+    ELEVENLABS_MODEL_ID: str = os.getenv("ELEVENLABS_MODEL_ID", "scribe_v1")
     
     # Application Configuration
     MAX_WORD_COUNT: int = 200
@@ -1,12 +1,30 @@
 """
 Document storage with Weaviate cloud vector database
 """
-from typing import Dict, List, Any, Optional
-from datetime import datetime
-import weaviate
-import weaviate.classes.config as wvc
-import weaviate.classes.query as wvq
+from typing import Dict, List, Any, Optional, Set, Tuple, Union
+import functools
+import re
+import time
+from datetime import datetime, timezone
 from tech_europe_hackathon.utils.config import CONFIG
+from tech_europe_hackathon.utils.resilience import resilient, WEAVIATE_BREAKER
+
+# Dates already in the RFC3339 form Weaviate expects
+_RFC3339_RE = re.compile(r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}Z")
+# Candidates fetched per title lookup: collections created with word tokenization also
+# return partial-title matches, which are filtered out by an exact comparison
+_TITLE_CANDIDATES = 10
+
+
+def _now_iso() -> str:
+    """Current time formatted as RFC3339 for document metadata"""
+    return _format_timestamp(int(time.time()))
+
+
+@functools.lru_cache(maxsize=1)
+def _format_timestamp(seconds: int) -> str:
+    """Format a whole-second timestamp; repeated calls within the same second reuse the string"""
+    return datetime.fromtimestamp(seconds).strftime('%Y-%m-%dT%H:%M:%SZ')
 
 
 class TextDocument:
@@ -16,27 +34,37 @@ class TextDocument:
         self.text = text
         self.footnotes = footnotes or []
         self.metadata = metadata or {}
-        self.metadata['created_at'] = self.metadata.get('created_at', datetime.now().strftime('%Y-%m-%dT%H:%M:%SZ'))
+        self.metadata['created_at'] = self.metadata.get('created_at', _now_iso())
+        # Formatted footnote rows cached by the UI; reset whenever footnotes change
+        self._footnote_rows = None
+        # Word count memoized for the text object it was computed from
+        self._word_count_text = None
+        self._word_count = 0
     
     def update_text(self, new_text: str):
         """Update the document text"""
         self.text = new_text
-        self.metadata['last_modified'] = datetime.now().strftime('%Y-%m-%dT%H:%M:%SZ')
+        self.metadata['last_modified'] = _now_iso()
     
     def update_footnotes(self, new_footnotes: List[str]):
         """Update the document footnotes"""
         self.footnotes = new_footnotes
-        self.metadata['last_modified'] = datetime.now().strftime('%Y-%m-%dT%H:%M:%SZ')
+        self._footnote_rows = None
+        self.metadata['last_modified'] = _now_iso()
     
     def add_footnote(self, footnote: str) -> int:
         """Add a footnote and return its number"""
         self.footnotes.append(footnote)
-        self.metadata['last_modified'] = datetime.now().strftime('%Y-%m-%dT%H:%M:%SZ')
+        self._footnote_rows = None
+        self.metadata['last_modified'] = _now_iso()
         return len(self.footnotes)
     
     def get_word_count(self) -> int:
         """Get word count of the main text"""
-        return len(self.text.split()) if self.text else 0
+        if self.text is not self._word_count_text:
+            self._word_count = len(self.text.split()) if self.text else 0
+            self._word_count_text = self.text
+        return self._word_count
 
 
 class StorageManager:
@@ -45,6 +73,7 @@ class StorageManager:
     def __init__(self):
         self.client = None
         self.collection_name = "Documents"
+        self._collection = None
         self._init_weaviate()
     
     def _init_weaviate(self):
@@ -52,6 +81,9 @@ class StorageManager:
         if not CONFIG.WEAVIATE_API_KEY:
             raise ValueError("WEAVIATE_API_KEY is required for cloud storage")
         
+        # Imported here so TextDocument users don't pay for the Weaviate SDK
+        import weaviate
+        
         self.client = weaviate.connect_to_weaviate_cloud(
             cluster_url=CONFIG.WEAVIATE_URL,
             auth_credentials=weaviate.auth.AuthApiKey(CONFIG.WEAVIATE_API_KEY),
@@ -59,6 +91,8 @@ class StorageManager:
         )
         
         self._create_collection()
+        # Collection handle is reused by every operation
+        self._collection = self.client.collections.get(self.collection_name)
         print("Weaviate cloud connected successfully")
     
     def _create_collection(self):
@@ -66,11 +100,14 @@ class StorageManager:
         if self.client.collections.exists(self.collection_name):
             print(f"Collection '{self.collection_name}' already exists")
             return
-            
+        
+        import weaviate.classes.config as wvc
         self.client.collections.create(
             name=self.collection_name,
             properties=[
-                wvc.Property(name="title", data_type=wvc.DataType.TEXT),
+                # Titles are looked up by exact value only, so index them as a single token
+                wvc.Property(name="title", data_type=wvc.DataType.TEXT, index_filterable=True,
+                             index_searchable=False, tokenization=wvc.Tokenization.FIELD),
                 wvc.Property(name="content", data_type=wvc.DataType.TEXT),
                 wvc.Property(name="summary", data_type=wvc.DataType.TEXT),
                 wvc.Property(name="footnotes", data_type=wvc.DataType.TEXT_ARRAY),
@@ -79,48 +116,88 @@ class StorageManager:
                 wvc.Property(name="created_at", data_type=wvc.DataType.DATE),
                 wvc.Property(name="modified_at", data_type=wvc.DataType.DATE),
             ],
-            vectorizer_config=wvc.Configure.Vectorizer.text2vec_openai(model="text-embedding-3-small"),
+            # text-embedding-3-small is Matryoshka-trained, so 512 dims keep most of the recall of 1536;
+            # product quantization (64 segments of 8 dims) compresses the HNSW vectors further
+            vectorizer_config=wvc.Configure.Vectorizer.text2vec_openai(model="text-embedding-3-small", dimensions=512),
+            vector_index_config=wvc.Configure.VectorIndex.hnsw(
+                quantizer=wvc.Configure.VectorIndex.Quantizer.pq(segments=64, training_limit=10000)
+            ),
             generative_config=wvc.Configure.Generative.openai(model="gpt-3.5-turbo")
         )
         print(f"Created collection '{self.collection_name}' with OpenAI vectorization")
 
-    def _format_date(self, date_str: str) -> str:
+    def _format_date(self, date_str: Union[str, datetime]) -> str:
         """Format date to RFC3339 for Weaviate"""
         if not date_str:
-            return datetime.now().strftime('%Y-%m-%dT%H:%M:%SZ')
+            return _now_iso()
+        # Documents loaded from Weaviate carry DATE properties as (UTC-aware) datetimes
+        if isinstance(date_str, datetime):
+            if date_str.tzinfo is not None:
+                date_str = date_str.astimezone(timezone.utc)
+            return date_str.strftime('%Y-%m-%dT%H:%M:%SZ')
+        if not isinstance(date_str, str):
+            return _now_iso()
+        # Metadata written by TextDocument is already in the target format
+        if _RFC3339_RE.fullmatch(date_str):
+            return date_str
         try:
             dt = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
             return dt.strftime('%Y-%m-%dT%H:%M:%SZ')
         except:
-            return datetime.now().strftime('%Y-%m-%dT%H:%M:%SZ')
+            return _now_iso()
 
+    @resilient(WEAVIATE_BREAKER)
     def save_document(self, document: TextDocument, title: str, summary: str = "", keywords: List[str] = None) -> bool:
         """Save document to Weaviate cloud"""
-        keywords = keywords or []
-        collection = self.client.collections.get(self.collection_name)
-        
-        data_object = {
-            "title": title,
-            "content": document.text,
-            "summary": summary or document.text[:200] + "...",
-            "footnotes": document.footnotes,
-            "keywords": keywords,
-            "word_count": document.get_word_count(),
-            "created_at": self._format_date(document.metadata.get('created_at')),
-            "modified_at": self._format_date(document.metadata.get('last_modified'))
-        }
+        data_object = self._to_data_object(document, title, summary, keywords)
         
         # Check if document exists and update or create
         existing = self._find_by_title(title)
         if existing:
-            collection.data.update(uuid=existing["uuid"], properties=data_object)
+            self._collection.data.update(uuid=existing["uuid"], properties=data_object)
             print(f"Updated document '{title}'")
         else:
-            collection.data.insert(properties=data_object)
+            self._collection.data.insert(properties=data_object)
             print(f"Saved new document '{title}'")
         
         return True
     
+    @resilient(WEAVIATE_BREAKER)
+    def save_documents_batch(self, documents: List[Tuple[TextDocument, str]]) -> bool:
+        """Save many (document, title) pairs to Weaviate cloud in a single request"""
+        if not documents:
+            return True
+        
+        from weaviate.classes.data import DataObject
+        
+        # Look up all existing titles at once; batch inserts with an existing UUID replace that object
+        existing = {title: obj.uuid for title, obj in self._find_by_titles({title for _, title in documents}).items()}
+        
+        result = self._collection.data.insert_many([
+            DataObject(properties=self._to_data_object(document, title), uuid=existing.get(title))
+            for document, title in documents
+        ])
+        if result.has_errors:
+            for index, error in result.errors.items():
+                print(f"Failed to save document '{documents[index][1]}': {error.message}")
+            return False
+        
+        print(f"Saved {len(documents)} documents ({len(existing)} updated)")
+        return True
+    
+    def _to_data_object(self, document: TextDocument, title: str, summary: str = "", keywords: List[str] = None) -> Dict[str, Any]:
+        """Build the Weaviate properties for a document"""
+        return {
+            "title": title,
+            "content": document.text,
+            "summary": summary or document.text[:200] + "...",
+            "footnotes": document.footnotes,
+            "keywords": keywords or [],
+            "word_count": document.get_word_count(),
+            "created_at": self._format_date(document.metadata.get('created_at')),
+            "modified_at": self._format_date(document.metadata.get('last_modified'))
+        }
+    
     def load_document(self, title: str) -> Optional[TextDocument]:
         """Load document by title from Weaviate cloud"""
         doc_data = self._find_by_title(title)
@@ -137,25 +214,41 @@ class StorageManager:
 
     def search_documents(self, query: str, limit: int = 5) -> List[str]:
         """Search documents by summary and return matching filenames"""
-        collection = self.client.collections.get(self.collection_name)
-        response = collection.query.near_text(query=query, limit=limit)
+        response = self._collection.query.near_text(query=query, limit=limit)
         return [obj.properties.get("title", "") for obj in response.objects if obj.properties.get("title")]
     
     def list_documents(self) -> List[str]:
         """List document titles"""
-        collection = self.client.collections.get(self.collection_name)
-        response = collection.query.fetch_objects(limit=5)
+        response = self._collection.query.fetch_objects(limit=5)
         return [obj.properties.get("title", "") for obj in response.objects]
     
     def _find_by_title(self, title: str) -> Optional[Dict[str, Any]]:
         """Find document by title in Weaviate cloud"""
-        collection = self.client.collections.get(self.collection_name)
-        response = collection.query.bm25(query=title, limit=1)
+        obj = self._find_by_titles({title}).get(title)
+        return {"uuid": str(obj.uuid), **obj.properties} if obj else None
+    
+    def _find_by_titles(self, titles: Set[str]) -> Dict[str, Any]:
+        """Map each of the given titles that exists in Weaviate to its stored object"""
+        import weaviate.classes.query as wvq
         
-        for obj in response.objects:
-            if obj.properties.get("title") == title:
-                return {"uuid": str(obj.uuid), **obj.properties}
-        return None
+        # Property filter instead of a ranked BM25 query; titles are compared exactly below
+        # since collections created with word tokenization match on tokens only. Partial-title
+        # matches can outnumber the exact ones, so page until every title is found.
+        filters = [wvq.Filter.by_property("title").equal(title) for title in titles]
+        title_filter = filters[0] if len(filters) == 1 else wvq.Filter.any_of(filters)
+        page_size = len(titles) * _TITLE_CANDIDATES
+        found = {}
+        offset = 0
+        while len(found) < len(titles):
+            response = self._collection.query.fetch_objects(filters=title_filter, limit=page_size, offset=offset)
+            for obj in response.objects:
+                title = obj.properties.get("title")
+                if title in titles:
+                    found.setdefault(title, obj)
+            if len(response.objects) < page_size:
+                break
+            offset += page_size
+        return found
     
     def close(self):
         """Close Weaviate connection"""
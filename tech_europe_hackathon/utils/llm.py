@@ -0,0 +1,57 @@
+"""
+Shared LLM clients so all agents reuse one connection pool per model
+"""
+import functools
+from typing import Any, Dict, List, TYPE_CHECKING
+from tech_europe_hackathon.utils.config import CONFIG
+from tech_europe_hackathon.utils.resilience import resilient, OPENAI_BREAKER
+
+if TYPE_CHECKING:
+    from crewai import LLM
+    from openai import OpenAI, AsyncOpenAI
+
+# Chat model used by every agent call (CrewAI, streaming, async and batch)
+LLM_MODEL = "gpt-4o-mini"
+
+
+@functools.lru_cache(maxsize=4)
+def get_llm(model: str = f"openai/{LLM_MODEL}") -> "LLM":
+    """Get the shared CrewAI LLM wrapper for a model"""
+    from crewai import LLM
+    return LLM(model=model, api_key=CONFIG.OPENAI_API_KEY)
+
+
+@functools.lru_cache(maxsize=1)
+def get_openai_client() -> "OpenAI":
+    """Get the shared OpenAI client (used for streaming and batch calls)"""
+    from openai import OpenAI
+    return OpenAI(api_key=CONFIG.OPENAI_API_KEY)
+
+
+@functools.lru_cache(maxsize=1)
+def get_async_openai_client() -> "AsyncOpenAI":
+    """Get the shared async OpenAI client (used for concurrent bulk calls)"""
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(api_key=CONFIG.OPENAI_API_KEY)
+
+
+@resilient(OPENAI_BREAKER)
+def call_llm(llm: "LLM", messages: List[Dict[str, str]]) -> str:
+    """Call a CrewAI LLM wrapper, retrying transient failures"""
+    return llm.call(messages)
+
+
+@resilient(OPENAI_BREAKER)
+def create_chat_completion(client: "OpenAI", **kwargs) -> Any:
+    """Create a chat completion (or stream), retrying transient failures"""
+    # Retries are done here, so the SDK's own retry loop is disabled for this request
+    return client.with_options(max_retries=0).chat.completions.create(**kwargs)
+
+
+def close_llm_clients():
+    """Close the shared clients; safe to call more than once"""
+    if get_openai_client.cache_info().currsize:
+        get_openai_client().close()
+    get_openai_client.cache_clear()
+    get_async_openai_client.cache_clear()
+    get_llm.cache_clear()
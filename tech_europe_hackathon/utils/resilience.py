@@ -0,0 +1,116 @@
+"""
+Call-level retries and circuit breakers for external API calls (OpenAI, ACI, ElevenLabs, Weaviate)
+"""
+import functools
+import random
+import threading
+import time
+from typing import Callable, Optional
+
+# HTTP statuses worth retrying: request timeout, rate limit and server-side errors
+_TRANSIENT_STATUS = frozenset({408, 429, 500, 502, 503, 504})
+# Exception class names used by the provider SDKs (openai, httpx, weaviate) for transient failures;
+# matched by name so this module does not have to import any of them
+_TRANSIENT_NAMES = frozenset({
+    "APIConnectionError", "APITimeoutError", "RateLimitError", "InternalServerError",
+    "TimeoutException", "ConnectError", "ReadError", "RemoteProtocolError",
+    "WeaviateTimeoutError", "WeaviateConnectionError"
+})
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a provider whose circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """Fails fast after fail_max consecutive transient failures, until reset_timeout has passed"""
+
+    def __init__(self, name: str, fail_max: int = 5, reset_timeout: float = 60):
+        self.name = name
+        self.fail_max = fail_max
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def before_call(self):
+        """Raise CircuitOpenError while the circuit is open; after the timeout a single trial call is let through"""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if self._trial_running or time.monotonic() - self._opened_at < self.reset_timeout:
+                raise CircuitOpenError(f"{self.name} is unavailable (circuit open), try again later")
+            # Half-open: only this call goes through; its outcome closes or re-opens the circuit
+            self._trial_running = True
+
+    def record_success(self):
+        """Record that the provider responded; closes the circuit"""
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self) -> bool:
+        """Count a transient failure; returns True if the circuit is now open"""
+        with self._lock:
+            self._failures += 1
+            # A failed trial call re-opens the circuit for another reset_timeout
+            if self._trial_running or (self._failures >= self.fail_max and self._opened_at is None):
+                self._opened_at = time.monotonic()
+                self._trial_running = False
+                print(f"Circuit opened for {self.name} after {self._failures} consecutive failures")
+            return self._opened_at is not None
+
+
+# One breaker per provider, shared by every call to it
+OPENAI_BREAKER = CircuitBreaker("OpenAI")
+ACI_BREAKER = CircuitBreaker("ACI.dev")
+ELEVENLABS_BREAKER = CircuitBreaker("ElevenLabs")
+WEAVIATE_BREAKER = CircuitBreaker("Weaviate")
+
+
+def is_transient(exc: BaseException) -> bool:
+    """Whether an exception is a timeout, connection problem, rate limit or 5xx worth retrying"""
+    if isinstance(exc, (TimeoutError, ConnectionError)):
+        return True
+    status = getattr(exc, "status_code", None) or getattr(getattr(exc, "response", None), "status_code", None)
+    if status in _TRANSIENT_STATUS:
+        return True
+    return any(cls.__name__ in _TRANSIENT_NAMES for cls in type(exc).__mro__)
+
+
+def resilient(breaker: CircuitBreaker, attempts: int = 3, initial: float = 0.5, max_wait: float = 8) -> Callable:
+    """
+    Retry a call on transient failures with exponential backoff and full jitter,
+    guarded by a provider circuit breaker
+
+    Args:
+        breaker: Circuit breaker of the provider being called
+        attempts: Maximum number of attempts
+        initial: Backoff before the first retry, in seconds
+        max_wait: Upper bound for a single backoff, in seconds
+    """
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            for attempt in range(attempts):
+                breaker.before_call()
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as e:
+                    if not is_transient(e):
+                        # The provider answered (e.g. a 400), so it is reachable
+                        breaker.record_success()
+                        raise
+                    # No point waiting for a retry the open circuit would reject; surface the real error
+                    if breaker.record_failure() or attempt == attempts - 1:
+                        raise
+                    delay = random.uniform(0, min(max_wait, initial * 2 ** attempt))
+                    print(f"{breaker.name} call failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                    time.sleep(delay)
+                else:
+                    breaker.record_success()
+                    return result
+        return wrapper
+    return decorator
@@ -0,0 +1,74 @@
+"""
+Local text preparation applied before content is sent to an LLM
+"""
+import math
+import re
+from collections import Counter
+from typing import List
+
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+|(?:\\n|\n)+")
+_WORD_RE = re.compile(r"[a-z0-9]+")
+# Markdown lines that carry no content: images, bare links, rules, table separators
+_BOILERPLATE_RE = re.compile(r"^\s*(?:!?\[[^\]]*\]\([^)]*\)\s*|[-*_=|:#>\s]+)$")
+
+# Rough tokens-per-character ratio for English text with gpt-4o-mini's tokenizer
+_CHARS_PER_TOKEN = 4
+_MIN_SENTENCE_WORDS = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate the token count of text without loading a tokenizer"""
+    return math.ceil(len(text) / _CHARS_PER_TOKEN)
+
+
+def _split_sentences(text: str) -> List[str]:
+    """Split text into candidate sentences, dropping boilerplate and fragments"""
+    sentences = []
+    for sentence in _SENTENCE_SPLIT_RE.split(text):
+        sentence = sentence.strip()
+        if not sentence or _BOILERPLATE_RE.match(sentence):
+            continue
+        if len(sentence.split()) < _MIN_SENTENCE_WORDS:
+            continue
+        sentences.append(sentence)
+    return sentences
+
+
+def extractive_prefilter(text: str, max_tokens: int = 2000) -> str:
+    """
+    Trim long scraped content to its most informative sentences
+
+    Sentences are ranked by TF-IDF weight (fitted on the document's own sentences)
+    and the top ones are kept, in their original order, until max_tokens is reached.
+    Text already within the budget is returned unchanged.
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    sentences = _split_sentences(text)
+    if not sentences:
+        return text[:max_tokens * _CHARS_PER_TOKEN]
+
+    term_counts = [Counter(_WORD_RE.findall(sentence.lower())) for sentence in sentences]
+    document_frequency = Counter(term for counts in term_counts for term in counts)
+    idf = {term: math.log(len(sentences) / df) + 1 for term, df in document_frequency.items()}
+
+    def score(counts: Counter) -> float:
+        total = sum(counts.values())
+        if not total:
+            return 0.0
+        # Mean TF-IDF weight, so long sentences are not favoured just for their length
+        return sum(count * idf[term] for term, count in counts.items()) / total
+
+    ranked = sorted(range(len(sentences)), key=lambda i: score(term_counts[i]), reverse=True)
+
+    selected = []
+    budget = max_tokens
+    for i in ranked:
+        cost = estimate_tokens(sentences[i]) + 1
+        if cost > budget:
+            continue
+        selected.append(i)
+        budget -= cost
+
+    return " ".join(sentences[i] for i in sorted(selected))